@@ -0,0 +1,63 @@
+"""Place lookups persisted between runs, keyed by normalized query.
+
+Kept free of Qt and geopy so it can be tested on its own.
+"""
+import json
+import os
+import threading
+
+GEOCODE_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".trajectory_mapper_cache.json")
+
+# (lat, lon, address) results keyed by normalized query. Lookups write it from
+# thread-pool workers while the GUI thread saves it, so all access takes the lock.
+_geocode_store = {}
+_store_lock = threading.Lock()
+
+
+def normalize_query(query):
+    return query.strip().lower()
+
+
+def cached_result(query_norm):
+    """Return the stored (lat, lon, address) for a normalized query, or None."""
+    with _store_lock:
+        entry = _geocode_store.get(query_norm)
+    return tuple(entry) if entry is not None else None
+
+
+def store_result(query_norm, result):
+    with _store_lock:
+        _geocode_store[query_norm] = result
+
+
+def _valid_cache_entry(entry):
+    """Check that a persisted entry has the (lat, lon, address) shape of a stored result."""
+    return (
+        isinstance(entry, list) and len(entry) == 3
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in entry[:2])
+        and isinstance(entry[2], str)
+    )
+
+
+def load_geocode_cache(path=GEOCODE_CACHE_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    if not isinstance(data, dict):
+        return
+    # Skip malformed entries rather than failing later inside a Qt slot
+    entries = {query: tuple(entry) for query, entry in data.items() if _valid_cache_entry(entry)}
+    with _store_lock:
+        _geocode_store.update(entries)
+
+
+def save_geocode_cache(path=GEOCODE_CACHE_FILE):
+    with _store_lock:
+        snapshot = dict(_geocode_store)
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+    except OSError:
+        pass
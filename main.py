@@ -1,16 +1,217 @@
 import sys
 import os
+import math
+import time
+import functools
+
 import folium
+import numpy as np
+from jinja2 import Template
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QMessageBox, QComboBox,
-    QSizePolicy, QGroupBox, QCheckBox
+    QSizePolicy, QGroupBox, QCheckBox, QSlider, QSpinBox
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import QUrl, Qt, pyqtSlot, QObject
+from PyQt5.QtCore import QByteArray, QUrl, Qt, QTimer, pyqtSlot, pyqtSignal, QObject, QRunnable, QThreadPool
 from PyQt5.QtWebChannel import QWebChannel
 from geopy.geocoders import Nominatim
 
+from geocode_cache import (
+    cached_result, load_geocode_cache, normalize_query, save_geocode_cache, store_result
+)
+from trajectory import (
+    Trajectory, bbox_intersects, decode_b64, downsample, encode_b64, encode_json, fit_view, pad_bounds,
+    simplify
+)
+
+CURRENT_DASH = '10,5'
+HEAD_RADIUS = 8
+SIMPLIFY_MIN_POINTS = 50
+DEFAULT_MAX_POINTS = 1000
+# Fitting to a single point would otherwise zoom to the tile layer's maximum
+FIT_MAX_ZOOM = 16
+# setContent() loads pages through a percent-encoded data: URL, which cannot exceed this
+SET_CONTENT_LIMIT = 2 * 1024 * 1024
+# Point batches at least this large are sent as packed float64 bytes instead of JSON
+B64_MIN_POINTS = 256
+# Trajectories within this fraction of the view size beyond the edges are still drawn
+CULL_MARGIN = 0.5
+# Stands in for the map's JavaScript name inside cached trajectory fragments
+_MAP_PLACEHOLDER = "__trajectory_map__"
+
+# The Leaflet init hook runs before folium's map script, so it captures the map for the
+# incremental addPointsJS() path. The current trajectory is drawn only from JavaScript.
+_CLICK_SCRIPT_HTML = f"""
+    <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+    <script>
+    L.Map.addInitHook(function () {{
+        window.map = this;
+    }});
+    window.addPointsJS = function (arr, trajIdx, color) {{
+        if (!window.map || !arr.length) {{
+            return;
+        }}
+        var last = arr[arr.length - 1];
+        if (!window.currentPolyline || window.currentTrajIdx !== trajIdx) {{
+            window.currentPolyline = L.polyline([], {{
+                color: color, weight: 4, dashArray: '{CURRENT_DASH}'
+            }}).addTo(window.map);
+            window.currentHead = L.circleMarker(last, {{
+                radius: {HEAD_RADIUS}, color: color, fill: true, fillColor: color
+            }}).addTo(window.map);
+        }}
+        window.currentTrajIdx = trajIdx;
+        if (arr.length === 1) {{
+            window.currentPolyline.addLatLng(last);
+        }} else {{
+            window.currentPolyline.setLatLngs(window.currentPolyline.getLatLngs().concat(arr));
+        }}
+        window.currentHead.setLatLng(last);
+    }};
+    window.addPointsB64JS = function (b64, n, trajIdx, color) {{
+        // b64 holds n little-endian float64 [lat, lng] pairs
+        var bin = atob(b64);
+        var bytes = new Uint8Array(bin.length);
+        for (var i = 0; i < bin.length; i++) {{
+            bytes[i] = bin.charCodeAt(i);
+        }}
+        var coords = new Float64Array(bytes.buffer);
+        var latlngs = new Array(n);
+        for (var j = 0; j < n; j++) {{
+            latlngs[j] = L.latLng(coords[2 * j], coords[2 * j + 1]);
+        }}
+        window.addPointsJS(latlngs, trajIdx, color);
+    }};
+    window.addPointJS = function (lat, lng, trajIdx, color) {{
+        window.addPointsJS([[lat, lng]], trajIdx, color);
+    }};
+    document.addEventListener('paste', function (e) {{
+        // Pasted text with one "lat, lng" pair per line is added to the current trajectory
+        if (!window.mapHandler) {{
+            return;
+        }}
+        var text = (e.clipboardData || window.clipboardData).getData('text');
+        var points = [];
+        text.split(/\\r?\\n/).forEach(function (line) {{
+            var nums = line.split(/[\\s,;]+/).filter(Boolean).map(Number);
+            if (nums.length >= 2 && isFinite(nums[0]) && isFinite(nums[1])) {{
+                points.push([nums[0], nums[1]]);
+            }}
+        }});
+        if (!points.length) {{
+            return;
+        }}
+        e.preventDefault();
+        if (points.length < {B64_MIN_POINTS}) {{
+            window.mapHandler.on_points_added(points);
+            return;
+        }}
+        // Large pastes cross the channel as packed little-endian float64 bytes instead of JSON arrays
+        var coords = new Float64Array(2 * points.length);
+        points.forEach(function (p, k) {{
+            coords[2 * k] = p[0];
+            coords[2 * k + 1] = p[1];
+        }});
+        var packed = new Uint8Array(coords.buffer);
+        var bin = '';
+        for (var i = 0; i < packed.length; i++) {{
+            bin += String.fromCharCode(packed[i]);
+        }}
+        window.mapHandler.on_points_added_b64(btoa(bin), points.length);
+    }});
+    document.addEventListener("DOMContentLoaded", function () {{
+        // Connect to Python once per page; later calls go through the cached window.mapHandler
+        if (window._handlerBound) {{
+            return;
+        }}
+        window._handlerBound = true;
+        new QWebChannel(qt.webChannelTransport, function(channel) {{
+            window.mapHandler = channel.objects.mapHandler;
+            if (window.map && window.mapHandler) {{
+                window.map.on('click', function(e) {{
+                    window.mapHandler.on_map_click(e.latlng.lat, e.latlng.lng);
+                }});
+                window.map.getContainer().style.cursor = 'crosshair';
+                var reportView = function () {{
+                    var b = window.map.getBounds();
+                    window.mapHandler.on_view_changed(b.getSouth(), b.getWest(), b.getNorth(), b.getEast(),
+                                                      window.map.getZoom());
+                }};
+                window.map.on('moveend', reportView);
+                reportView();
+            }}
+        }});
+    }});
+    </script>
+    """
+
+# Nominatim's usage policy allows at most one request per second
+GEOCODE_MIN_INTERVAL = 1.0
+
+
+@functools.lru_cache(maxsize=1024)
+def _geocode(query_norm):
+    """Return (lat, lon, address) for a normalized query, or None if nothing matched."""
+    result = cached_result(query_norm)
+    if result is not None:
+        return result
+    location = Nominatim(user_agent="trajectory_app").geocode(query_norm, timeout=10)
+    if location is None:
+        return None
+    result = (location.latitude, location.longitude, location.address)
+    store_result(query_norm, result)
+    return result
+
+
+@functools.lru_cache(maxsize=4)
+def _map_tiles(style):
+    """Tile layer settings for a map style; callers must not mutate the returned dict."""
+    if style == "Satellite":
+        return {
+            'tiles': 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+            'attr': 'Tiles © Esri'
+        }
+    elif style == "Terrain":
+        return {
+            'tiles': 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Terrain_Base/MapServer/tile/{z}/{y}/{x}',
+            'attr': 'Tiles © Esri'
+        }
+    return {'tiles': 'OpenStreetMap'}
+
+
+class CachedScript(folium.MacroElement):
+    """Adds an already rendered script fragment to the page without re-templating its layers."""
+
+    _template = Template("{% macro script(this, kwargs) %}{{ this.fragment }}{% endmacro %}")
+
+    def __init__(self, fragment):
+        super().__init__()
+        self._name = "CachedScript"
+        self.fragment = fragment
+
+
+class GeocodeSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class GeocodeTask(QRunnable):
+    """Runs a Nominatim lookup on the global thread pool so the UI stays responsive."""
+
+    def __init__(self, place_name):
+        super().__init__()
+        self.place_name = place_name
+        self.signals = GeocodeSignals()
+
+    def run(self):
+        try:
+            result = _geocode(normalize_query(self.place_name))
+        except Exception as exc:  # an exception escaping QRunnable.run() aborts the process
+            self.signals.failed.emit(str(exc) or type(exc).__name__)
+            return
+        self.signals.finished.emit(result)
+
 
 class MapClickHandler(QObject):
     def __init__(self, app):
@@ -22,6 +223,26 @@ class MapClickHandler(QObject):
         if self.app.click_mode_enabled:
             self.app.add_trajectory_point(lat, lon)
 
+    @pyqtSlot('QVariantList')
+    def on_points_added(self, points):
+        try:
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        except (TypeError, ValueError):
+            return
+        self.app.add_trajectory_points(points)
+
+    @pyqtSlot(str, int)
+    def on_points_added_b64(self, b64, n):
+        try:
+            points = decode_b64(b64, n)
+        except ValueError:
+            return
+        self.app.add_trajectory_points(points)
+
+    @pyqtSlot(float, float, float, float, int)
+    def on_view_changed(self, south, west, north, east, zoom):
+        self.app.update_view((south, west, north, east), zoom)
+
 
 class TrajectoryMapApp(QWidget):
     def __init__(self):
@@ -30,14 +251,50 @@ class TrajectoryMapApp(QWidget):
         self.setGeometry(100, 100, 1400, 900)
 
         self.completed_trajectories = []
-        self.current_trajectory = []
+        self.current_trajectory = Trajectory()
         self.click_mode_enabled = True
+        self.current_zoom = 12
+        self.view_center = [40.7128, -74.0060]
+        self.view_bounds = None
+        self.rendered_indices = set()
+        self.rendered_zoom = None
+        # (lat, lon, address) of the last search result, drawn on every rebuild
+        self.found_place = None
+        # [[south, west], [north, east]] over every point; starts inverted so the first point sets it
+        self._global_bbox = np.array([[90.0, 180.0], [-90.0, -180.0]])
+        self._fit_pending = False
+        # Points pushed while a page is loading are held back and sent once it has finished
+        self._page_loading = False
+        self._points_on_page = 0
+        # Last rendered page, kept so a failed in-memory load can be retried from disk
+        self._page_data = b""
+        self._loaded_from_memory = False
+        # loadFinished carries no id, so loads are numbered in the order they are started
+        self._loads_issued = 0
+        self._loads_finished = 0
+        # Pages are loaded from memory; a qrc base lets them pull in qwebchannel.js
+        self.base_url = QUrl("qrc:/")
+        self._map_file = os.path.abspath("trajectory_map.html")
         self.trajectory_colors = ['red', 'blue', 'green', 'purple', 'orange']
 
         self.click_handler = MapClickHandler(self)
         self.channel = QWebChannel()
         self.channel.registerObject('mapHandler', self.click_handler)
 
+        # Bursts of refresh requests (clicks, slider drags, panning) collapse into one rebuild
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(50)
+        self._refresh_timer.timeout.connect(self._do_refresh_map)
+
+        # Searches are throttled to GEOCODE_MIN_INTERVAL; only the latest waiting query is sent
+        self._last_geocode_ts = 0.0
+        self._pending_place = None
+        self._geocode_in_flight = False
+        self._geocode_timer = QTimer(self)
+        self._geocode_timer.setSingleShot(True)
+        self._geocode_timer.timeout.connect(self._do_geocode)
+
         self.setup_ui()
         self.create_initial_map()
 
@@ -48,6 +305,7 @@ class TrajectoryMapApp(QWidget):
 
         self.map_view = QWebEngineView()
         self.map_view.page().setWebChannel(self.channel)
+        self.map_view.loadFinished.connect(self.on_map_loaded)
         self.map_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         layout.addWidget(self.map_view, 1)
 
@@ -70,8 +328,8 @@ class TrajectoryMapApp(QWidget):
         self.search_input.setPlaceholderText("Search Place")
         self.search_input.returnPressed.connect(self.search_place)
 
-        search_btn = QPushButton("Search")
-        search_btn.clicked.connect(self.search_place)
+        self.search_btn = QPushButton("Search")
+        self.search_btn.clicked.connect(self.search_place)
 
         self.map_style_combo = QComboBox()
         self.map_style_combo.addItems(["OpenStreetMap", "Satellite", "Terrain"])
@@ -84,7 +342,7 @@ class TrajectoryMapApp(QWidget):
         layout.addWidget(add_btn)
         layout.addStretch()
         layout.addWidget(self.search_input)
-        layout.addWidget(search_btn)
+        layout.addWidget(self.search_btn)
         layout.addWidget(QLabel("Style:"))
         layout.addWidget(self.map_style_combo)
 
@@ -108,12 +366,32 @@ class TrajectoryMapApp(QWidget):
         self.click_toggle.setChecked(True)
         self.click_toggle.stateChanged.connect(self.toggle_click_mode)
 
+        # Simplification tolerance in screen pixels, converted to degrees at the current zoom
+        self.simplify_slider = QSlider(Qt.Horizontal)
+        self.simplify_slider.setRange(0, 10)
+        self.simplify_slider.setValue(2)
+        self.simplify_slider.setFixedWidth(120)
+        self.simplify_slider.setToolTip("Simplification tolerance (pixels)")
+        self.simplify_slider.valueChanged.connect(self.refresh_map)
+
+        # Hard cap on points sent to Leaflet per trajectory, applied after simplification
+        self.max_points_spin = QSpinBox()
+        self.max_points_spin.setRange(10, 100000)
+        self.max_points_spin.setSingleStep(100)
+        self.max_points_spin.setValue(DEFAULT_MAX_POINTS)
+        self.max_points_spin.setToolTip("Maximum points drawn per trajectory")
+        self.max_points_spin.valueChanged.connect(self.refresh_map)
+
         self.trajectory_count_label = QLabel("Trajectories: 0 | Points: 0")
 
         layout.addWidget(self.finish_btn)
         layout.addWidget(self.clear_current_btn)
         layout.addWidget(self.clear_all_btn)
         layout.addStretch()
+        layout.addWidget(QLabel("Simplify:"))
+        layout.addWidget(self.simplify_slider)
+        layout.addWidget(QLabel("Max points:"))
+        layout.addWidget(self.max_points_spin)
         layout.addWidget(self.click_toggle)
         layout.addWidget(self.trajectory_count_label)
 
@@ -123,7 +401,7 @@ class TrajectoryMapApp(QWidget):
     def create_status_panel(self):
         group = QGroupBox("ℹ️ Status")
         layout = QVBoxLayout()
-        self.status_label = QLabel("✅ Ready! Click the map to add points.")
+        self.status_label = QLabel("✅ Ready! Click the map or paste coordinates to add points.")
         layout.addWidget(self.status_label)
         group.setLayout(layout)
         return group
@@ -132,45 +410,13 @@ class TrajectoryMapApp(QWidget):
         self.click_mode_enabled = (state == Qt.Checked)
 
     def create_initial_map(self):
-        self.current_map = folium.Map(location=[40.7128, -74.0060], zoom_start=12)
+        self.create_map_at_location(self.view_center, zoom=self.current_zoom)
+        self.add_all_trajectories_to_map()
         self.add_map_click_handler()
         self.save_and_display_map()
 
     def add_map_click_handler(self):
-        # Short minified version of qwebchannel.js (not the full one, just a stub for demo purposes)
-        qwebchannel_stub = """
-        (function () {
-            window.QWebChannel = function (transport, callback) {
-                transport.send(JSON.stringify({type: "connect"}));
-                this.objects = {
-                    mapHandler: {
-                        on_map_click: function (lat, lng) {
-                            transport.send(JSON.stringify({type: "click", lat: lat, lng: lng}));
-                        }
-                    }
-                };
-                callback(this);
-            };
-        })();
-        """
-
-        js = f"""
-        <script>{qwebchannel_stub}</script>
-        <script>
-        document.addEventListener("DOMContentLoaded", function () {{
-            new QWebChannel(qt.webChannelTransport, function(channel) {{
-                var handler = channel.objects.mapHandler;
-                if (window.map && handler) {{
-                    window.map.on('click', function(e) {{
-                        handler.on_map_click(e.latlng.lat, e.latlng.lng);
-                    }});
-                    window.map.getContainer().style.cursor = 'crosshair';
-                }}
-            }});
-        }});
-        </script>
-        """
-        self.current_map.get_root().html.add_child(folium.Element(js))
+        self.current_map.get_root().html.add_child(folium.Element(_CLICK_SCRIPT_HTML))
 
     def add_manual_point(self):
         try:
@@ -179,36 +425,127 @@ class TrajectoryMapApp(QWidget):
             if not (-90 <= lat <= 90 and -180 <= lon <= 180):
                 raise ValueError
             self.add_trajectory_point(lat, lon)
+            if not bbox_intersects((lat, lon, lat, lon), self.view_bounds):
+                self.fit_view_to_points()
             self.lat_input.clear()
             self.lon_input.clear()
         except ValueError:
             QMessageBox.warning(self, "Invalid Input", "Please enter valid coordinates.")
 
     def add_trajectory_point(self, lat, lon):
-        self.current_trajectory.append([lat, lon])
+        self.current_trajectory.append(lat, lon)
+        point = (lat, lon)
+        self._global_bbox[0] = np.minimum(self._global_bbox[0], point)
+        self._global_bbox[1] = np.maximum(self._global_bbox[1], point)
         self.update_status()
-        self.refresh_map()
+        self.sync_current_trajectory()
+
+    def sync_current_trajectory(self):
+        """Draw the current-trajectory points the loaded page does not show yet."""
+        if self._page_loading:
+            return
+        points = self.current_trajectory.points(self._points_on_page)
+        self._points_on_page = len(self.current_trajectory)
+        if len(points) == 1:
+            self.push_point_to_map(*points[0].tolist())
+        elif len(points):
+            self.push_points_to_map(downsample(points, self.max_points_spin.value()))
+
+    def on_map_loaded(self, ok):
+        # Each load, including one interrupted by a newer load, finishes in the order it was
+        # started; only the signal that catches up with _loads_issued is for the newest page
+        self._loads_finished = min(self._loads_finished + 1, self._loads_issued)
+        if self._loads_finished != self._loads_issued:
+            return
+        if ok:
+            self._page_loading = False
+            self.sync_current_trajectory()
+        elif self._loaded_from_memory:
+            # The newest in-memory load failed, most likely over the data: URL limit
+            self.load_map_file()
+        else:
+            self._page_loading = False
+
+    def push_point_to_map(self, lat, lon):
+        # Draw the new point on the already loaded page instead of rebuilding the whole map
+        index = len(self.completed_trajectories)
+        self.map_view.page().runJavaScript(
+            "addPointJS(%.8f, %.8f, %d, '%s')" % (lat, lon, index, self.trajectory_color(index))
+        )
+
+    def add_trajectory_points(self, points):
+        """Append many [lat, lon] points and draw them with a single JavaScript call."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        valid = (
+            np.isfinite(points).all(axis=1)
+            & (np.abs(points[:, 0]) <= 90) & (np.abs(points[:, 1]) <= 180)
+        )
+        points = points[valid]
+        if not len(points):
+            self.status_label.setText("❌ No valid coordinates to add.")
+            return
+        self.current_trajectory.extend(points[:, 0], points[:, 1])
+        self._global_bbox[0] = np.minimum(self._global_bbox[0], points.min(axis=0))
+        self._global_bbox[1] = np.maximum(self._global_bbox[1], points.max(axis=0))
+        self.update_status()
+        self.status_label.setText(f"📋 Added {len(points)} points.")
+        self.sync_current_trajectory()
+
+    def push_points_to_map(self, points):
+        index = len(self.completed_trajectories)
+        color = self.trajectory_color(index)
+        if len(points) >= B64_MIN_POINTS:
+            script = "addPointsB64JS('%s', %d, %d, '%s')" % (encode_b64(points), len(points), index, color)
+        else:
+            script = "addPointsJS(%s, %d, '%s')" % (encode_json(points), index, color)
+        self.map_view.page().runJavaScript(script)
 
     def finish_current_trajectory(self):
         if not self.current_trajectory:
             QMessageBox.information(self, "Empty", "No points to save.")
             return
-        self.completed_trajectories.append(self.current_trajectory.copy())
+        self.completed_trajectories.append(self.current_trajectory.frozen())
         self.current_trajectory.clear()
         self.update_status()
+        self._fit_pending = True
         self.refresh_map()
 
     def clear_current_trajectory(self):
         self.current_trajectory.clear()
+        self.reset_global_bbox()
         self.update_status()
         self.refresh_map()
 
     def clear_all_trajectories(self):
         self.completed_trajectories.clear()
         self.current_trajectory.clear()
+        self.reset_global_bbox()
         self.update_status()
         self.refresh_map()
 
+    def reset_global_bbox(self):
+        # Only completed trajectories remain, and each already carries its own bbox
+        self._global_bbox = np.array([[90.0, 180.0], [-90.0, -180.0]])
+        if self.completed_trajectories:
+            boxes = np.array([traj.bbox for traj in self.completed_trajectories])
+            self._global_bbox[0] = boxes[:, :2].min(axis=0)
+            self._global_bbox[1] = boxes[:, 2:].max(axis=0)
+
+    def has_points(self):
+        return self._global_bbox[0, 0] <= self._global_bbox[1, 0]
+
+    def fit_view_to_points(self):
+        if self.has_points():
+            (lat, lon), zoom = self.fitted_view()
+            self.map_view.page().runJavaScript(
+                "window.map && window.map.setView([%.8f, %.8f], %d)" % (lat, lon, zoom)
+            )
+
+    def fitted_view(self):
+        """Center and zoom that show every point, capped at FIT_MAX_ZOOM."""
+        (south, west), (north, east) = self._global_bbox.tolist()
+        return fit_view((south, west, north, east), self.map_view.width(), self.map_view.height(), FIT_MAX_ZOOM)
+
     def update_status(self):
         self.trajectory_count_label.setText(
             f"Trajectories: {len(self.completed_trajectories)} | Points: {len(self.current_trajectory)}"
@@ -218,64 +555,187 @@ class TrajectoryMapApp(QWidget):
         place = self.search_input.text().strip()
         if not place:
             return
-        geolocator = Nominatim(user_agent="trajectory_app")
-        location = geolocator.geocode(place)
-        if location:
-            self.create_map_at_location([location.latitude, location.longitude], zoom=15)
-            folium.Marker([location.latitude, location.longitude], popup=location.address).add_to(self.current_map)
-            self.add_all_trajectories_to_map()
-            self.add_map_click_handler()
-            self.save_and_display_map()
-            self.status_label.setText(f"📍 Found: {location.address}")
+        self._pending_place = place
+        if not self._geocode_in_flight:
+            self._schedule_geocode()
+
+    def _schedule_geocode(self):
+        remaining = GEOCODE_MIN_INTERVAL - (time.monotonic() - self._last_geocode_ts)
+        if remaining > 0:
+            self._geocode_timer.start(int(remaining * 1000))
+        else:
+            self._do_geocode()
+
+    def _do_geocode(self):
+        place, self._pending_place = self._pending_place, None
+        if place is None:
+            return
+        self._geocode_in_flight = True
+        self.search_btn.setEnabled(False)
+        self.status_label.setText(f"🔎 Searching: {place}")
+        task = GeocodeTask(place)
+        task.signals.finished.connect(self.on_geocode_finished)
+        task.signals.failed.connect(self.on_geocode_failed)
+        QThreadPool.globalInstance().start(task)
+
+    def _geocode_done(self):
+        self._last_geocode_ts = time.monotonic()
+        self._geocode_in_flight = False
+        self.search_btn.setEnabled(True)
+        if self._pending_place is not None:
+            self._schedule_geocode()
+
+    def on_geocode_finished(self, result):
+        self._geocode_done()
+        if result:
+            lat, lon, address = result
+            self.found_place = result
+            self.view_center = [lat, lon]
+            self.current_zoom = 15
+            self._fit_pending = False
+            # Rebuild now; a queued refresh would otherwise replace the search result
+            self._refresh_timer.stop()
+            self._do_refresh_map()
+            self.status_label.setText(f"📍 Found: {address}")
         else:
             self.status_label.setText("❌ Location not found.")
 
+    def on_geocode_failed(self, message):
+        self._geocode_done()
+        self.status_label.setText(f"❌ Search failed: {message}")
+
     def create_map_at_location(self, center, zoom):
+        self.view_center = center
+        self.current_zoom = zoom
+        # Best guess until the page reports its real bounds through on_view_changed()
+        self.view_bounds = self.estimate_bounds(center, zoom)
         tile = self.get_map_tiles()
-        self.current_map = folium.Map(location=center, zoom_start=zoom, tiles=tile['tiles'], attr=tile.get('attr'))
+        self.current_map = folium.Map(
+            location=center, zoom_start=zoom, tiles=tile['tiles'], attr=tile.get('attr'), prefer_canvas=True
+        )
 
     def get_map_tiles(self):
-        style = self.map_style_combo.currentText()
-        if style == "Satellite":
-            return {
-                'tiles': 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-                'attr': 'Tiles © Esri'
-            }
-        elif style == "Terrain":
-            return {
-                'tiles': 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Terrain_Base/MapServer/tile/{z}/{y}/{x}',
-                'attr': 'Tiles © Esri'
-            }
-        return {'tiles': 'OpenStreetMap'}
+        return _map_tiles(self.map_style_combo.currentText())
+
+    def estimate_bounds(self, center, zoom):
+        # One 256px tile spans 360 / 2**zoom degrees of longitude; latitude shrinks by cos(lat)
+        deg_per_px = 360.0 / (256 * 2 ** zoom)
+        half_lon = self.map_view.width() / 2 * deg_per_px
+        half_lat = self.map_view.height() / 2 * deg_per_px * math.cos(math.radians(center[0]))
+        return (center[0] - half_lat, center[1] - half_lon, center[0] + half_lat, center[1] + half_lon)
+
+    def update_view(self, bounds, zoom):
+        south, west, north, east = bounds
+        self.view_bounds = bounds
+        self.view_center = [(south + north) / 2, (west + east) / 2]
+        self.current_zoom = zoom
+        visible = self.visible_indices(bounds)
+        # Rebuild only when the view reveals culled trajectories or simplification needs a new zoom
+        zoom_changed = zoom != self.rendered_zoom and any(
+            len(self.completed_trajectories[i]) > SIMPLIFY_MIN_POINTS for i in visible
+        )
+        if zoom_changed or not visible <= self.rendered_indices:
+            self.refresh_map()
+
+    def visible_indices(self, bounds):
+        return {
+            i for i, traj in enumerate(self.completed_trajectories)
+            if bbox_intersects(traj.bbox, bounds)
+        }
 
     def refresh_map(self):
-        center = self.current_trajectory[-1] if self.current_trajectory else [40.7128, -74.0060]
-        self.create_map_at_location(center, zoom=15)
+        self._refresh_timer.start()
+
+    def _do_refresh_map(self):
+        center, zoom = self.view_center, self.current_zoom
+        if self._fit_pending and self.has_points():
+            # Build the page at the fitted view, so rendered_zoom and the simplification
+            # tolerance already match what Leaflet shows and no second rebuild follows
+            center, zoom = self.fitted_view()
+        self._fit_pending = False
+        self.create_map_at_location(center, zoom=zoom)
         self.add_all_trajectories_to_map()
         self.add_map_click_handler()
         self.save_and_display_map()
 
     def add_all_trajectories_to_map(self):
-        for i, traj in enumerate(self.completed_trajectories):
-            self.draw_trajectory(traj, i, completed=True)
-        if self.current_trajectory:
-            self.draw_trajectory(self.current_trajectory, len(self.completed_trajectories), completed=False)
-
-    def draw_trajectory(self, points, index, completed):
-        color = self.trajectory_colors[index % len(self.trajectory_colors)]
-        for pt in points:
-            folium.CircleMarker(pt, radius=6, color=color, fill=True, fill_color=color).add_to(self.current_map)
+        if self.found_place:
+            lat, lon, address = self.found_place
+            folium.Marker([lat, lon], popup=address).add_to(self.current_map)
+        self.rendered_indices = self.visible_indices(pad_bounds(self.view_bounds, CULL_MARGIN))
+        self.rendered_zoom = self.current_zoom
+        for i in sorted(self.rendered_indices):
+            self.draw_trajectory(self.completed_trajectories[i], i)
+        # The current trajectory is sent in one addPointsJS() batch once the page has loaded
+        self._points_on_page = 0
+
+    def trajectory_color(self, index):
+        return self.trajectory_colors[index % len(self.trajectory_colors)]
+
+    def simplify_epsilon(self):
+        # One 256px tile spans 360 / 2**zoom degrees of longitude; simplify() rescales latitude
+        return self.simplify_slider.value() * 360.0 / (256 * 2 ** self.current_zoom)
+
+    def draw_trajectory(self, trajectory, index):
+        color = self.trajectory_color(index)
+        epsilon = self.simplify_epsilon() if len(trajectory) > SIMPLIFY_MIN_POINTS else None
+        max_points = self.max_points_spin.value()
+        key = (color, epsilon, max_points)
+        if trajectory.cache_key != key:
+            trajectory.html_cache = self.render_trajectory_script(trajectory, color, epsilon, max_points)
+            trajectory.cache_key = key
+        # Fragments reference their map by name, so point them at the map being built
+        fragment = trajectory.html_cache.replace(_MAP_PLACEHOLDER, self.current_map.get_name())
+        CachedScript(fragment).add_to(self.current_map)
+
+    def render_trajectory_script(self, trajectory, color, epsilon, max_points):
+        """Render a finished trajectory's layers once, on a throwaway map, and return their script."""
+        scratch = folium.Map(tiles=None)
+        points = trajectory.points()
+        if epsilon is not None:
+            # A screen pixel covers only cos(lat) as many degrees of latitude as of longitude
+            mid_lat = (trajectory.bbox[0] + trajectory.bbox[2]) / 2
+            points = simplify(points, epsilon, lat_scale=1.0 / math.cos(math.radians(mid_lat)))
+        points = downsample(points, max_points).tolist()
+        folium.Marker(points[0], tooltip="Start", icon=folium.Icon(color=color)).add_to(scratch)
         if len(points) > 1:
-            folium.PolyLine(points, color=color, weight=4, dash_array=None if completed else '10,5').add_to(self.current_map)
+            folium.Marker(points[-1], tooltip="End", icon=folium.Icon(color=color)).add_to(scratch)
+            folium.PolyLine(points, color=color, weight=4).add_to(scratch)
+        figure = scratch.get_root()
+        figure.render()
+        # Relies on branca's Figure keeping each rendered MacroElement script as a child of
+        # figure.script, keyed by the element's name (true for folium 0.15+). The map's own
+        # script is skipped so only the trajectory layers are cached.
+        scripts = [
+            element.render() for name, element in figure.script._children.items()
+            if name != scratch.get_name()
+        ]
+        return "\n".join(scripts).replace(scratch.get_name(), _MAP_PLACEHOLDER)
 
     def save_and_display_map(self):
-        path = os.path.abspath("trajectory_map.html")
-        self.current_map.save(path)
-        self.map_view.setUrl(QUrl.fromLocalFile(path))
+        self._page_loading = True
+        self._page_data = self.current_map.get_root().render().encode("utf-8", "replace")
+        content = QByteArray(self._page_data)
+        if len(content.toPercentEncoding()) < SET_CONTENT_LIMIT:
+            self._loaded_from_memory = True
+            self._loads_issued += 1
+            self.map_view.setContent(content, "text/html;charset=UTF-8", self.base_url)
+            return
+        # Too large for setContent(), fall back to loading it from disk
+        self.load_map_file()
+
+    def load_map_file(self):
+        self._loaded_from_memory = False
+        with open(self._map_file, "wb") as f:
+            f.write(self._page_data)
+        self._loads_issued += 1
+        self.map_view.setUrl(QUrl.fromLocalFile(self._map_file))
 
 
 def main():
     app = QApplication(sys.argv)
+    load_geocode_cache()
+    app.aboutToQuit.connect(save_geocode_cache)
     window = TrajectoryMapApp()
     window.show()
     sys.exit(app.exec_())
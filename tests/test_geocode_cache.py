@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pytest
+
+import geocode_cache
+from geocode_cache import (
+    cached_result, load_geocode_cache, normalize_query, save_geocode_cache, store_result
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    geocode_cache._geocode_store.clear()
+    yield
+    geocode_cache._geocode_store.clear()
+
+
+def test_normalize_query():
+    assert normalize_query("  New York ") == "new york"
+
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / "cache.json"
+    store_result("paris", (48.85, 2.35, "Paris, France"))
+    save_geocode_cache(path)
+    geocode_cache._geocode_store.clear()
+    load_geocode_cache(path)
+    assert cached_result("paris") == (48.85, 2.35, "Paris, France")
+
+
+@pytest.mark.parametrize("content", ["42", "[1, 2, 3]", '"text"', "null", "{not json"])
+def test_load_ignores_files_without_an_object(tmp_path, content):
+    path = tmp_path / "cache.json"
+    path.write_text(content, encoding="utf-8")
+    load_geocode_cache(path)
+    assert geocode_cache._geocode_store == {}
+
+
+def test_load_skips_malformed_entries(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({
+        "good": [1.0, 2, "Somewhere"],
+        "short": [1.0, 2.0],
+        "long": [1.0, 2.0, "x", 4],
+        "text_coords": ["1", 2.0, "x"],
+        "bool_coords": [True, 2.0, "x"],
+        "no_address": [1.0, 2.0, None],
+        "not_a_list": {"lat": 1.0},
+    }), encoding="utf-8")
+    load_geocode_cache(path)
+    assert geocode_cache._geocode_store == {"good": (1.0, 2, "Somewhere")}
+
+
+def test_load_missing_file_is_ignored(tmp_path):
+    load_geocode_cache(tmp_path / "missing.json")
+    assert cached_result("anything") is None
+
+
+def test_save_while_another_thread_stores(tmp_path):
+    path = tmp_path / "cache.json"
+
+    def writer():
+        for i in range(2000):
+            store_result("place %d" % i, (0.0, 0.0, "x"))
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while thread.is_alive():
+        save_geocode_cache(path)
+    thread.join()
+    save_geocode_cache(path)
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == 2000
@@ -0,0 +1,145 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from trajectory import (
+    Trajectory, bbox_intersects, decode_b64, downsample, encode_b64, encode_json, fit_view, pad_bounds,
+    simplify
+)
+
+
+def test_simplify_collinear_line_keeps_only_endpoints():
+    points = np.column_stack((np.zeros(100), np.linspace(0.0, 1.0, 100)))
+    result = simplify(points, 1e-6)
+    np.testing.assert_array_equal(result, points[[0, -1]])
+
+
+def test_simplify_keeps_point_beyond_tolerance():
+    points = np.array([[0.0, 0.0], [0.0, 0.5], [1.0, 1.0], [0.0, 1.5], [0.0, 2.0]])
+    result = simplify(points, 0.1)
+    assert [1.0, 1.0] in result.tolist()
+    np.testing.assert_array_equal(result[[0, -1]], points[[0, -1]])
+
+
+def test_simplify_closed_loop_with_equal_endpoints():
+    points = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]])
+    result = simplify(points, 0.1)
+    assert len(result) >= 3
+    np.testing.assert_array_equal(result[0], result[-1])
+
+
+def test_simplify_lat_scale_measures_latitude_in_screen_units():
+    # At 60 degrees a 0.06 degree latitude bump spans as many pixels as 0.12 degrees of longitude
+    points = np.array([[60.0, 0.0], [60.06, 0.5], [60.0, 1.0]])
+    assert len(simplify(points, 0.1)) == 2
+    assert len(simplify(points, 0.1, lat_scale=2.0)) == 3
+
+
+@pytest.mark.parametrize("epsilon", [0.0, -1.0])
+def test_simplify_without_tolerance_returns_all_points(epsilon):
+    points = np.random.default_rng(0).random((20, 2))
+    np.testing.assert_array_equal(simplify(points, epsilon), points)
+
+
+def test_simplify_short_input_is_unchanged():
+    points = np.array([[0.0, 0.0], [1.0, 1.0]])
+    np.testing.assert_array_equal(simplify(points, 10.0), points)
+
+
+@pytest.mark.parametrize("n", [3, 10, 999, 1000, 1001, 2500])
+@pytest.mark.parametrize("max_points", [2, 3, 7, 1000])
+def test_downsample_bounds_size_and_keeps_ends(n, max_points):
+    points = np.column_stack((np.arange(n, dtype=float), np.arange(n, dtype=float)))
+    result = downsample(points, max_points)
+    if n > max_points:
+        assert len(result) <= max_points
+    else:
+        assert len(result) == n
+    np.testing.assert_array_equal(result[0], points[0])
+    np.testing.assert_array_equal(result[-1], points[-1])
+
+
+def test_downsample_leaves_small_input_alone():
+    points = np.zeros((5, 2))
+    assert downsample(points, 10) is points
+
+
+def test_trajectory_append_grows_past_initial_capacity():
+    traj = Trajectory()
+    for i in range(100):
+        traj.append(i, -i)
+    assert len(traj) == 100
+    assert traj.cap >= 100
+    np.testing.assert_array_equal(traj.points()[:, 0], np.arange(100))
+    np.testing.assert_array_equal(traj.points()[:, 1], -np.arange(100))
+
+
+def test_trajectory_extend_across_capacity():
+    traj = Trajectory()
+    traj.append(0.0, 0.0)
+    lat = np.arange(1, 41, dtype=float)
+    traj.extend(lat, lat * 2)
+    assert len(traj) == 41
+    np.testing.assert_array_equal(traj.points(1), np.column_stack((lat, lat * 2)))
+
+
+def test_trajectory_frozen_is_trimmed_copy_with_bbox():
+    traj = Trajectory()
+    for lat, lng in [(1.0, 5.0), (-2.0, 7.0), (3.0, 6.0)]:
+        traj.append(lat, lng)
+    frozen = traj.frozen()
+    traj.clear()
+    assert len(frozen) == 3
+    assert frozen.cap == 3
+    assert frozen.bbox == (-2.0, 5.0, 3.0, 7.0)
+
+
+def test_bbox_intersects_and_pad_bounds():
+    view = (0.0, 0.0, 1.0, 1.0)
+    assert bbox_intersects((0.5, 0.5, 2.0, 2.0), view)
+    assert not bbox_intersects((1.5, 1.5, 2.0, 2.0), view)
+    assert bbox_intersects((1.5, 1.5, 2.0, 2.0), pad_bounds(view, 0.5))
+
+
+def test_encode_json_round_trips_strided_points():
+    points = np.random.default_rng(1).random((50, 2))[::3]
+    assert json.loads(encode_json(points)) == points.tolist()
+
+
+def test_b64_round_trip():
+    points = np.random.default_rng(2).random((300, 2))
+    np.testing.assert_array_equal(decode_b64(encode_b64(points), 300), points)
+
+
+@pytest.mark.parametrize("n", [0, -1, 299, 301])
+def test_decode_b64_rejects_wrong_count(n):
+    payload = encode_b64(np.zeros((300, 2)))
+    with pytest.raises(ValueError):
+        decode_b64(payload, n)
+
+
+def test_decode_b64_rejects_malformed_base64():
+    with pytest.raises(ValueError):
+        decode_b64("not base64!", 1)
+
+
+def test_fit_view_single_point_uses_max_zoom():
+    center, zoom = fit_view((40.0, -74.0, 40.0, -74.0), 800, 600, 16)
+    assert center == [40.0, -74.0]
+    assert zoom == 16
+
+
+def test_fit_view_contains_box():
+    bounds = (40.0, -75.0, 41.0, -73.0)
+    center, zoom = fit_view(bounds, 800, 600, 16)
+    deg_per_px = 360.0 / (256 * 2 ** zoom)
+    assert 800 * deg_per_px >= 2.0
+    assert 600 * deg_per_px * math.cos(math.radians(center[0])) >= 1.0
+    # One level closer would no longer fit
+    assert 800 * deg_per_px / 2 < 2.0 or 600 * deg_per_px / 2 * math.cos(math.radians(center[0])) < 1.0
+
+
+def test_fit_view_whole_world_clamps_to_zero():
+    assert fit_view((-85.0, -180.0, 85.0, 180.0), 100, 100, 16)[1] == 0
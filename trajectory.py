@@ -0,0 +1,179 @@
+"""Pure NumPy helpers for storing, simplifying and culling trajectories.
+
+Kept free of Qt and folium so they can be tested on their own.
+"""
+import base64
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional, only speeds up point payloads
+    orjson = None
+
+
+def fit_view(bounds, width, height, max_zoom):
+    """Return the center and largest integer zoom at which a Web Mercator view of
+    ``width`` x ``height`` pixels contains the (south, west, north, east) box.
+
+    A 256px tile spans 360 / 2**zoom degrees of longitude, and a pixel covers
+    cos(lat) times fewer degrees of latitude than of longitude.
+    """
+    south, west, north, east = bounds
+    center = [(south + north) / 2, (west + east) / 2]
+    zooms = [max_zoom]
+    if east > west:
+        zooms.append(math.log2(width * 360.0 / (256 * (east - west))))
+    if north > south:
+        zooms.append(math.log2(height * 360.0 * math.cos(math.radians(center[0])) / (256 * (north - south))))
+    return center, max(0, min(max_zoom, math.floor(min(zooms))))
+
+
+def pad_bounds(bounds, margin):
+    south, west, north, east = bounds
+    d_lat = (north - south) * margin
+    d_lon = (east - west) * margin
+    return (south - d_lat, west - d_lon, north + d_lat, east + d_lon)
+
+
+def bbox_intersects(a, b):
+    """Check whether two (south, west, north, east) boxes overlap."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def simplify(points, epsilon_deg, lat_scale=1.0):
+    """Ramer-Douglas-Peucker simplification of an (n, 2) lat/lon array.
+
+    Iterative rather than recursive so very long trajectories cannot hit the
+    recursion limit; distances for each segment are computed in one vectorized
+    pass. The first and last points are always kept.
+
+    Latitudes are multiplied by ``lat_scale`` before measuring distances, so
+    passing ``1 / cos(lat)`` makes ``epsilon_deg`` a longitude-degree tolerance
+    on both screen axes of a Web Mercator map.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n < 3 or epsilon_deg <= 0:
+        return points
+    original = points
+    if lat_scale != 1.0:
+        points = points * (lat_scale, 1.0)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg = points[end] - points[start]
+        rel = points[start + 1:end] - points[start]
+        seg_len = np.hypot(seg[0], seg[1])
+        if seg_len == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        i = int(np.argmax(dist))
+        if dist[i] > epsilon_deg:
+            index = start + 1 + i
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return original[keep]
+
+
+def encode_json(points):
+    """Serialize an (n, 2) float array as a JSON string for a JavaScript payload."""
+    if orjson is not None:
+        return orjson.dumps(np.ascontiguousarray(points), option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(points.tolist())
+
+
+def encode_b64(points):
+    """Pack an (n, 2) array as base64 little-endian float64 bytes for addPointsB64JS()."""
+    return base64.b64encode(np.ascontiguousarray(points, dtype='<f8').tobytes()).decode("ascii")
+
+
+def decode_b64(b64, n):
+    """Unpack encode_b64() output holding exactly ``n`` points.
+
+    Raises ValueError for malformed base64, a non-positive ``n`` or a payload
+    whose size does not match ``n``.
+    """
+    data = base64.b64decode(b64, validate=True)
+    if n <= 0 or len(data) != 16 * n:
+        raise ValueError("expected %d packed points, got %d bytes" % (n, len(data)))
+    return np.frombuffer(data, dtype='<f8').reshape(n, 2)
+
+
+def downsample(points, max_points):
+    """Stride-sample an (n, 2) array down to at most max_points rows, keeping both ends."""
+    n = len(points)
+    if max_points < 2 or n <= max_points:
+        return points
+    step = -(-(n - 1) // (max_points - 1))
+    sampled = points[::step]
+    if (n - 1) % step:
+        sampled = np.vstack((sampled, points[-1:]))
+    return sampled
+
+
+@dataclass(eq=False)
+class Trajectory:
+    """Trajectory points kept as separate lat/lng float64 arrays (SoA).
+
+    The arrays are preallocated and doubled when full, so appending a point is
+    amortized O(1) and only ``n`` entries are valid.
+    """
+    lat: np.ndarray = field(default_factory=lambda: np.empty(16))
+    lng: np.ndarray = field(default_factory=lambda: np.empty(16))
+    n: int = 0
+    bbox: Optional[tuple] = None
+    # Rendered folium script for a finished trajectory, valid while cache_key matches
+    html_cache: Optional[str] = None
+    cache_key: Optional[tuple] = None
+
+    @property
+    def cap(self):
+        return len(self.lat)
+
+    def __len__(self):
+        return self.n
+
+    def append(self, lat, lng):
+        if self.n == self.cap:
+            new_cap = max(2 * self.cap, 16)
+            self.lat = np.resize(self.lat, new_cap)
+            self.lng = np.resize(self.lng, new_cap)
+        self.lat[self.n] = lat
+        self.lng[self.n] = lng
+        self.n += 1
+
+    def extend(self, lat, lng):
+        """Append arrays of points in one go, growing the storage at most once."""
+        count = len(lat)
+        if self.n + count > self.cap:
+            new_cap = max(2 * self.cap, self.n + count, 16)
+            self.lat = np.resize(self.lat, new_cap)
+            self.lng = np.resize(self.lng, new_cap)
+        self.lat[self.n:self.n + count] = lat
+        self.lng[self.n:self.n + count] = lng
+        self.n += count
+
+    def clear(self):
+        self.n = 0
+
+    def points(self, start=0):
+        """Return the valid points from ``start`` on as an (n, 2) array of [lat, lng] rows."""
+        return np.column_stack((self.lat[start:self.n], self.lng[start:self.n]))
+
+    def frozen(self):
+        """Return a trimmed copy with its bounding box, used when a trajectory is finished."""
+        lat = self.lat[:self.n].copy()
+        lng = self.lng[:self.n].copy()
+        bbox = (float(lat.min()), float(lng.min()), float(lat.max()), float(lng.max()))
+        return Trajectory(lat, lng, self.n, bbox)